@@ -5,19 +5,51 @@ Based on the approach from your provided code
 """
 
 import anvil
+import logging
+import mmap
+import numpy as np
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from anvil.errors import OutOfBoundsCoordinates
+from anvil.versions import VERSION_20w17a
+from concurrent.futures import ThreadPoolExecutor
+
+# All possible air block types to filter out, interned so lookups can match on identity
+_AIR_BLOCKS = frozenset(sys.intern(block) for block in (
+    "minecraft:air",
+    "minecraft:cave_air",
+    "minecraft:void_air",
+    "air",
+    "cave_air",
+    "void_air"
+))
+
+logger = logging.getLogger(__name__)
 
 class WorkingMinecraftReader:
-    def __init__(self, world_path: str = "minecraft_saves/cs2_test"):
+    def __init__(self, world_path: str = "minecraft_saves/cs2_test",
+                 region_cache_size: int = 8, chunk_cache_size: int = 256):
         """
         Initialise the world reader
         
         Args:
             world_path: Path to the Minecraft world folder
+            region_cache_size: Maximum number of region files kept in memory
+            chunk_cache_size: Maximum number of chunks kept in memory
         """
+        if chunk_cache_size < 1:
+            raise ValueError(f"chunk_cache_size must be at least 1, got {chunk_cache_size}")
+        
         self.world_directory = os.path.join(world_path, "region")
-        self.region_cache = {}  # Cache for region files
-        self.chunk_cache = {}   # Cache for chunks
+        self.region_cache = OrderedDict()  # LRU cache for region files
+        self.chunk_cache = {}              # LRU-2 cache for chunks
+        self._chunk_access_times = {}      # Last two access times per cached chunk
+        self.region_cache_size = region_cache_size
+        self.chunk_cache_size = chunk_cache_size
+        self._cache_lock = threading.Lock()  # Guards both caches across threads
         
         if not os.path.exists(self.world_directory):
             raise FileNotFoundError(f"Region folder not found at {self.world_directory}")
@@ -53,53 +85,184 @@ class WorkingMinecraftReader:
             return block.id
             
         except Exception as e:
-            print(f"Error reading block at ({x}, {y}, {z}): {e}")
+            logger.warning(f"Error reading block at ({x}, {y}, {z}): {e}")
             return "minecraft:air"
     
     def _get_chunk(self, chunk_x: int, chunk_z: int):
-        """Get chunk with caching, following the working example's approach"""
+        """Get chunk with LRU-2 caching, following the working example's approach"""
         
-        # Check if chunk is already cached
-        if (chunk_x, chunk_z) in self.chunk_cache:
-            return self.chunk_cache[(chunk_x, chunk_z)]
-        
-        # Determine which region file this chunk belongs to
-        region_x = chunk_x // 32
-        region_z = chunk_z // 32
+        with self._cache_lock:
+            # Check if chunk is already cached
+            if (chunk_x, chunk_z) in self.chunk_cache:
+                self._chunk_access_times[(chunk_x, chunk_z)].append(time.monotonic())
+                return self.chunk_cache[(chunk_x, chunk_z)]
+            
+            # Determine which region file this chunk belongs to
+            region_x = chunk_x // 32
+            region_z = chunk_z // 32
+            
+            # Get the region (with caching)
+            region = self._get_region(region_x, region_z)
         
-        # Get the region (with caching)
-        region = self._get_region(region_x, region_z)
         if region is None:
             return None
         
         try:
-            # Get the chunk using the same method as the working code
+            # Get the chunk using the same method as the working code.
+            # Decompression happens outside the lock so threads can overlap.
             chunk = region.get_chunk(chunk_x % 32, chunk_z % 32)
+        except Exception as e:
+            logger.warning(f"Error loading chunk at ({chunk_x}, {chunk_z}): {e}")
+            return None
+        
+        with self._cache_lock:
             self.chunk_cache[(chunk_x, chunk_z)] = chunk  # Cache the chunk
-            return chunk
+            self._chunk_access_times[(chunk_x, chunk_z)] = deque([time.monotonic()], maxlen=2)
+            while len(self.chunk_cache) > self.chunk_cache_size:
+                self._evict_chunk(keep=(chunk_x, chunk_z))
+        return chunk
+    
+    def _evict_chunk(self, keep=None):
+        """
+        Evict the chunk whose second most recent access is oldest (LRU-2)
+        
+        Chunks touched only once, e.g. by a single area sweep, count as never
+        accessed twice and are evicted first, so they can't push out chunks
+        that are being reused.
+        
+        Args:
+            keep: Key of the chunk just inserted, which is never the victim so
+                that it gets the chance to be accessed a second time
+        """
+        def eviction_key(key):
+            access_times = self._chunk_access_times[key]
+            second_last = access_times[0] if len(access_times) == 2 else float("-inf")
+            return (second_last, access_times[-1])
+        
+        victim = min((key for key in self.chunk_cache if key != keep), key=eviction_key)
+        del self.chunk_cache[victim]
+        del self._chunk_access_times[victim]
+    
+    @staticmethod
+    def _section_states(chunk, section, palette_size: int):
+        """
+        Unpack a section's block states into palette indices
+        
+        Args:
+            chunk: Chunk the section belongs to
+            section: Section NBT compound
+            palette_size: Number of entries in the section's palette
             
-        except Exception as e:
-            print(f"Error loading chunk at ({chunk_x}, {chunk_z}): {e}")
+        Returns:
+            16x16x16 array of palette indices ordered [y, z, x], or None if
+            the section's layout isn't supported and must be read block by block
+        """
+        if chunk.version < VERSION_20w17a:
+            return None  # Older formats pack states across long boundaries
+        
+        if "block_states" in section:
+            block_states = section["block_states"]
+            if "data" not in block_states:
+                return np.zeros((16, 16, 16), dtype=np.uint16)  # Single palette entry
+            data = block_states["data"].value
+        elif "BlockStates" in section:
+            data = section["BlockStates"].value
+        else:
+            return None
+        
+        bits = max(4, (palette_size - 1).bit_length())
+        per_long = 64 // bits
+        if len(data) * per_long < 4096:
             return None
+        
+        # Longs come back signed or unsigned depending on the NBT library
+        longs = np.array([value & 0xFFFFFFFFFFFFFFFF for value in data], dtype=np.uint64)
+        shifts = np.arange(per_long, dtype=np.uint64) * np.uint64(bits)
+        states = (longs[:, None] >> shifts) & np.uint64((1 << bits) - 1)
+        return states.ravel()[:4096].astype(np.uint16).reshape(16, 16, 16)
+    
+    @classmethod
+    def _scan_section(cls, chunk, section_y: int, x_range: range, y_range: range,
+                      z_range: range):
+        """
+        Find the non-air blocks of one 16-block tall chunk section
+        
+        Args:
+            chunk: Chunk to read
+            section_y: Section index (world y // 16)
+            x_range, z_range: Chunk-local x and z to include
+            y_range: World y to include, within this section
+            
+        Returns:
+            (positions, block_ids) where positions is an (N, 3) array of
+            chunk-local x, world y and chunk-local z
+        """
+        no_blocks = (np.empty((0, 3), dtype=np.int32), [])
+        
+        section = chunk.get_section(section_y)
+        if section is None:
+            return no_blocks  # Missing sections are all air
+        
+        try:
+            palette = chunk.get_palette(section)
+        except Exception:
+            palette = None  # No usable palette (e.g. pre-1.13 chunks)
+        
+        if palette is not None:
+            palette_is_air = np.array([block.id in _AIR_BLOCKS for block in palette], dtype=bool)
+            if palette_is_air.all():
+                return no_blocks
+            
+            states = cls._section_states(chunk, section, len(palette))
+            if states is not None:
+                # Mask out air across the requested box in one go
+                base_y = section_y << 4
+                box = states[y_range.start - base_y:y_range.stop - base_y,
+                             z_range.start:z_range.stop,
+                             x_range.start:x_range.stop]
+                ys, zs, xs = np.nonzero(~palette_is_air[box])
+                positions = np.column_stack((xs + x_range.start, ys + y_range.start, zs + z_range.start))
+                block_ids = [palette[index].id for index in box[ys, zs, xs].tolist()]
+                return positions.astype(np.int32), block_ids
+        
+        # Fall back to reading the section block by block
+        positions = []
+        block_ids = []
+        get_chunk_block = chunk.get_block
+        for block_x in x_range:
+            for y in y_range:
+                for block_z in z_range:
+                    block = get_chunk_block(block_x, y, block_z).id
+                    # Only include if it's NOT any type of air block
+                    if block not in _AIR_BLOCKS:
+                        positions.append((block_x, y, block_z))
+                        block_ids.append(block)
+        
+        return np.array(positions, dtype=np.int32).reshape(-1, 3), block_ids
     
     def _get_region(self, region_x: int, region_z: int):
-        """Get region with caching"""
+        """Get region with LRU caching"""
         
         # Check if region is already cached
         if (region_x, region_z) in self.region_cache:
+            self.region_cache.move_to_end((region_x, region_z))
             return self.region_cache[(region_x, region_z)]
         
         # Build region file path
         region_file = os.path.join(self.world_directory, f"r.{region_x}.{region_z}.mca")
         
         try:
-            # Load region using the same method as the working code
-            region = anvil.Region.from_file(region_file)
+            # Memory-map the region so only the chunk sectors we read are paged in
+            with open(region_file, 'rb') as f:
+                region_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            region = anvil.Region(data=region_data)
             self.region_cache[(region_x, region_z)] = region  # Cache the region
+            if len(self.region_cache) > self.region_cache_size:
+                self.region_cache.popitem(last=False)  # Evict least recently used
             return region
             
         except Exception as e:
-            print(f"Error loading region file: {region_file}. Exception: {e}")
+            logger.warning(f"Error loading region file: {region_file}. Exception: {e}")
             return None
     
     def get_multiple_blocks(self, coordinates: list) -> dict:
@@ -130,38 +293,98 @@ class WorkingMinecraftReader:
         for file in sorted(region_files):
             print(f"  {file}")
     
-    def scan_area(self, x1: int, y1: int, z1: int, x2: int, y2: int, z2: int):
+    def scan_area(self, x1: int, y1: int, z1: int, x2: int, y2: int, z2: int,
+                  max_workers: int = None):
         """
         Scan an area and return all non-air blocks
         
         Args:
             x1, y1, z1: Start coordinates
             x2, y2, z2: End coordinates
+            max_workers: Number of chunk loading threads (defaults to CPU count)
             
         Returns:
             Dictionary of coordinates to block types
         """
-        blocks = {}
-        
-        # All possible air block types to filter out
-        air_blocks = {
-            "minecraft:air", 
-            "minecraft:cave_air", 
-            "minecraft:void_air",
-            "air", 
-            "cave_air", 
-            "void_air"
-        }
-        
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                for z in range(min(z1, z2), max(z1, z2) + 1):
-                    block = self.get_block(x, y, z)
-                    # Only include if it's NOT any type of air block
-                    if block not in air_blocks:
-                        blocks[(x, y, z)] = block
+        return dict(self.scan_area_iter(x1, y1, z1, x2, y2, z2, max_workers))
+    
+    def scan_area_iter(self, x1: int, y1: int, z1: int, x2: int, y2: int, z2: int,
+                       max_workers: int = None):
+        """
+        Scan an area and yield non-air blocks as they are read
         
-        return blocks
+        Args:
+            x1, y1, z1: Start coordinates
+            x2, y2, z2: End coordinates
+            max_workers: Number of chunk loading threads (defaults to CPU count)
+            
+        Yields:
+            ((x, y, z), block) pairs for every non-air block
+        """
+        for positions, block_ids in self.scan_area_arrays(x1, y1, z1, x2, y2, z2, max_workers):
+            yield from zip(map(tuple, positions.tolist()), block_ids)
+    
+    def scan_area_arrays(self, x1: int, y1: int, z1: int, x2: int, y2: int, z2: int,
+                         max_workers: int = None):
+        """
+        Scan an area and yield its non-air blocks in batches, one per chunk section
+        
+        Chunks are loaded and decompressed on a thread pool, then read one
+        after another on the calling thread. Batches come out chunk by chunk
+        and, within a chunk, section by section from the bottom up; blocks
+        in a batch are ordered by y, then z, then x.
+        
+        Args:
+            x1, y1, z1: Start coordinates
+            x2, y2, z2: End coordinates
+            max_workers: Number of chunk loading threads (defaults to CPU count)
+            
+        Yields:
+            (positions, block_ids) where positions is an (N, 3) int32 array
+            of world x, y, z and block_ids the matching block names
+        """
+        x_min, x_max = min(x1, x2), max(x1, x2)
+        y_min, y_max = min(y1, y2), max(y1, y2)
+        z_min, z_max = min(z1, z2), max(z1, z2)
+        
+        # Every chunk the area touches, so each chunk is fetched once
+        chunk_coords = [(chunk_x, chunk_z)
+                        for chunk_x in range(x_min >> 4, (x_max >> 4) + 1)
+                        for chunk_z in range(z_min >> 4, (z_max >> 4) + 1)]
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        # Load a few chunks per worker at a time to keep memory bounded
+        batch_size = max_workers * 4
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(chunk_coords), batch_size):
+                batch = chunk_coords[start:start + batch_size]
+                chunks = executor.map(self._get_chunk, *zip(*batch))
+                
+                for (chunk_x, chunk_z), chunk in zip(batch, chunks):
+                    if chunk is None:
+                        continue  # Missing chunks are all air
+                    
+                    # Intersect the requested area with this chunk's 16x16 footprint
+                    base_x = chunk_x << 4
+                    base_z = chunk_z << 4
+                    block_x_range = range(max(x_min, base_x) - base_x, min(x_max, base_x + 15) - base_x + 1)
+                    block_z_range = range(max(z_min, base_z) - base_z, min(z_max, base_z + 15) - base_z + 1)
+                    
+                    try:
+                        for section_y in range(y_min >> 4, (y_max >> 4) + 1):
+                            y_range = range(max(y_min, section_y << 4), min(y_max, (section_y << 4) + 15) + 1)
+                            try:
+                                positions, block_ids = self._scan_section(chunk, section_y, block_x_range,
+                                                                          y_range, block_z_range)
+                            except OutOfBoundsCoordinates:
+                                continue  # Sections outside the world's height limits hold nothing
+                            if block_ids:
+                                positions += (base_x, 0, base_z)  # Chunk-local to world coordinates
+                                yield positions, block_ids
+                    except Exception as e:
+                        # Skip the rest of a chunk that can't be read, warning once
+                        logger.warning(f"Error reading chunk at ({chunk_x}, {chunk_z}): {e}")
 
 def main():
     try:
@@ -186,44 +409,39 @@ def main():
             x1, y1, z1, x2, y2, z2 = map(int, coords)
             print(f"Scanning area from ({x1}, {y1}, {z1}) to ({x2}, {y2}, {z2})...")
             
-            blocks = reader.scan_area(x1, y1, z1, x2, y2, z2)
+            # Generate filename with hash underscore
+            import hashlib
+            scan_string = f"{x1}_{y1}_{z1}_{x2}_{y2}_{z2}"
+            hash_hex = hashlib.md5(scan_string.encode()).hexdigest()[:8]
+            filename = f"minecraft_out_{hash_hex}.txt"
             
-            if blocks:
-                print(f"Found {len(blocks)} non-air blocks")
-                
-                # Generate filename with hash underscore
-                import hashlib
-                scan_string = f"{x1}_{y1}_{z1}_{x2}_{y2}_{z2}"
-                hash_hex = hashlib.md5(scan_string.encode()).hexdigest()[:8]
-                filename = f"minecraft_out_{hash_hex}.txt"
-                
-                # Write to file with coordinates multiplied by 48
-                with open(filename, 'w') as f:
-                    for (x, y, z), block in blocks.items():
-                        scaled_x = x * 48
-                        scaled_y = y * 48
-                        scaled_z = z * 48
-                        f.write(f"{scaled_z} {scaled_x} {scaled_y}\n")
-                
-                print(f"Saved {len(blocks)} block positions to {filename}")
+            # Stream blocks straight to the file with coordinates multiplied by 48
+            block_count = 0
+            preview = []
+            with open(filename, 'w') as f:
+                for positions, block_ids in reader.scan_area_arrays(x1, y1, z1, x2, y2, z2):
+                    # Reorder to z, x, y and scale the whole batch at once
+                    scaled = positions[:, [2, 0, 1]] * 48
+                    np.savetxt(f, scaled, fmt='%d')
+                    if block_count < 5:
+                        preview.extend(scaled[:5 - block_count].tolist())
+                    block_count += len(scaled)
+            
+            if block_count:
+                print(f"Found {block_count} non-air blocks")
+                print(f"Saved {block_count} block positions to {filename}")
                 print(f"Coordinates scaled by 48x")
                 
                 # Show first few entries as preview
                 print("\nFirst few entries:")
-                count = 0
-                for (x, y, z), block in blocks.items():
-                    if count >= 5:
-                        break
-                    scaled_x = x * 48
-                    scaled_y = y * 48
-                    scaled_z = z * 48
+                for scaled_z, scaled_x, scaled_y in preview:
                     print(f"  {scaled_z} {scaled_x} {scaled_y}")
-                    count += 1
                 
-                if len(blocks) > 5:
-                    print(f"  ... and {len(blocks) - 5} more")
+                if block_count > 5:
+                    print(f"  ... and {block_count - 5} more")
                     
             else:
+                os.remove(filename)  # Don't leave an empty output file behind
                 print("No non-air blocks found in the specified area")
         else:
             print("Please start your command with 'scan'")
@@ -5,45 +5,117 @@ import uuid
 import argparse
 import hashlib
 import os
+import struct
 import subprocess
+import tempfile
 
 def generate_new_uid():
-    return str(uuid.uuid4())
+    return str(uuid.uuid4()).encode()
 
 def generate_new_reference_id():
     import random
-    return f"0x{random.randint(0, 2**64-1):016x}"
+    return f"0x{random.randint(0, 2**64-1):016x}".encode()
+
+# Draw the random bytes for many IDs with a single urandom call
+def bulk_generate_uids(count):
+    buf = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=buf[i:i + 16], version=4)).encode() for i in range(0, 16 * count, 16)]
+
+def bulk_generate_reference_ids(count):
+    return [b"0x%016x" % ref for ref in struct.unpack(f"<{count}Q", os.urandom(8 * count))]
+
+ELEMENTID_RE = re.compile(rb'("id" "elementid" ")([a-f0-9-]+)(")')
+REFERENCEID_RE = re.compile(rb'("referenceID" "uint64" ")(0x(?!0")[a-f0-9]+)(")')
 
 def replace_uids_in_content(content):
-    elementid_pattern = r'"id" "elementid" "([a-f0-9-]+)"'
-    elementids = re.findall(elementid_pattern, content)
-    
     uid_mapping = {}
-    for old_uid in set(elementids):
-        uid_mapping[old_uid] = generate_new_uid()
+    def replace_uid(match):
+        old_uid = match.group(2)
+        if old_uid not in uid_mapping:
+            uid_mapping[old_uid] = generate_new_uid()
+        return match.group(1) + uid_mapping[old_uid] + match.group(3)
+    
+    content = ELEMENTID_RE.sub(replace_uid, content)
     
-    for old_uid, new_uid in uid_mapping.items():
-        content = content.replace(f'"id" "elementid" "{old_uid}"', f'"id" "elementid" "{new_uid}"')
+    ref_mapping = {}
+    def replace_ref(match):
+        old_ref = match.group(2)
+        if old_ref not in ref_mapping:
+            ref_mapping[old_ref] = generate_new_reference_id()
+        return match.group(1) + ref_mapping[old_ref] + match.group(3)
     
-    reference_pattern = r'"referenceID" "uint64" "(0x[a-f0-9]+)"'
-    references = re.findall(reference_pattern, content)
+    return REFERENCEID_RE.sub(replace_ref, content)
+
+ORIGIN_RE = re.compile(rb'"origin" "vector3" "[^"]+"')
+NODEID_RE = re.compile(rb'"nodeID" "int" "\d+"')
+
+# Turn the mesh template into a bytes format string with %(uid_N)s, %(ref_N)s,
+# %(origin)s and %(node_id)d placeholders so each copy is a single % call
+def compile_mesh_template(mesh_template):
+    mesh_template = mesh_template.replace(b'%', b'%%')
+    
+    uid_indices = {}
+    def uid_placeholder(match):
+        index = uid_indices.setdefault(match.group(2), len(uid_indices))
+        return b'%s%%(uid_%d)s%s' % (match.group(1), index, match.group(3))
     
-    for old_ref in set(references):
-        if old_ref != "0x0":
-            new_ref = generate_new_reference_id()
-            content = content.replace(f'"referenceID" "uint64" "{old_ref}"', f'"referenceID" "uint64" "{new_ref}"')
+    ref_indices = {}
+    def ref_placeholder(match):
+        index = ref_indices.setdefault(match.group(2), len(ref_indices))
+        return b'%s%%(ref_%d)s%s' % (match.group(1), index, match.group(3))
     
-    return content
+    mesh_template = ELEMENTID_RE.sub(uid_placeholder, mesh_template)
+    mesh_template = REFERENCEID_RE.sub(ref_placeholder, mesh_template)
+    mesh_template = ORIGIN_RE.sub(b'"origin" "vector3" "%(origin)s"', mesh_template)
+    mesh_template = NODEID_RE.sub(b'"nodeID" "int" "%(node_id)d"', mesh_template)
+    
+    return mesh_template, len(uid_indices), len(ref_indices)
 
-def update_origin_in_mesh(mesh_content, x, y, z):
-    origin_pattern = r'"origin" "vector3" "[^"]+"'
-    new_origin = f'"origin" "vector3" "{x} {y} {z}"'
-    return re.sub(origin_pattern, new_origin, mesh_content)
+# Bump whenever compile_mesh_template's output or the cache layout changes so old caches are rebuilt
+MESH_TEMPLATE_CACHE_VERSION = 2
+# Cache header: format version, SHA-256 of the mesh file, UID count, reference count,
+# SHA-256 of the compiled template that follows the header
+MESH_TEMPLATE_CACHE_HEADER = struct.Struct(">I32sII32s")
 
-def update_node_id_in_mesh(mesh_content, new_node_id):
-    node_id_pattern = r'"nodeID" "int" "\d+"'
-    new_node_id_str = f'"nodeID" "int" "{new_node_id}"'
-    return re.sub(node_id_pattern, new_node_id_str, mesh_content)
+# Reuse the compiled mesh template from a cache file next to the mesh file while
+# the mesh file's contents are unchanged
+def load_mesh_template(mesh_template, cache_path):
+    mesh_hash = hashlib.sha256(mesh_template).digest()
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = f.read()
+        version, cached_hash, n_uids, n_refs, body_hash = MESH_TEMPLATE_CACHE_HEADER.unpack_from(cache)
+        mesh_template_fmt = cache[MESH_TEMPLATE_CACHE_HEADER.size:]
+        # The body hash rejects caches left truncated by an interrupted write
+        if (version == MESH_TEMPLATE_CACHE_VERSION and cached_hash == mesh_hash
+                and hashlib.sha256(mesh_template_fmt).digest() == body_hash):
+            return mesh_template_fmt, n_uids, n_refs
+    except (OSError, struct.error):
+        pass  # Missing or unreadable cache, compile from scratch
+    
+    mesh_template_fmt, n_uids, n_refs = compile_mesh_template(mesh_template)
+    header = MESH_TEMPLATE_CACHE_HEADER.pack(MESH_TEMPLATE_CACHE_VERSION, mesh_hash, n_uids, n_refs,
+                                             hashlib.sha256(mesh_template_fmt).digest())
+    temp_path = None
+    try:
+        # Write to a temporary file and swap it in, so concurrent runs never see a partial cache
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(cache_path) or '.', delete=False) as f:
+            temp_path = f.name
+            f.write(header + mesh_template_fmt)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # Caching is only an optimisation
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return mesh_template_fmt, n_uids, n_refs
+
+def expand_mesh_template(mesh_template_fmt, uids, refs, x, y, z, node_id):
+    subs = {f"uid_{i}".encode(): uid for i, uid in enumerate(uids)}
+    subs.update({f"ref_{i}".encode(): ref for i, ref in enumerate(refs)})
+    subs[b"origin"] = f"{x} {y} {z}".encode()
+    subs[b"node_id"] = node_id
+    return mesh_template_fmt % subs
 
 def read_coordinates_from_file(filename):
     coordinates = []
@@ -56,19 +128,20 @@ def read_coordinates_from_file(filename):
                     coordinates.append((float(parts[0]), float(parts[1]), float(parts[2])))
     return coordinates
 
-def insert_meshes_after_nav_data(template_content, mesh_insertions):
-    nav_data_end_pattern = r'(\s*"editorOnly" "bool" "0"\s*\}\s*)(,?\s*)\]'
-    match = re.search(nav_data_end_pattern, template_content)
+NAV_DATA_END_RE = re.compile(rb'(\s*"editorOnly" "bool" "0"\s*\}\s*)(,?\s*)\]')
+
+def insert_meshes_after_nav_data(template_content, mesh_insertions, out):
+    match = NAV_DATA_END_RE.search(template_content)
     
     if not match:
-        return template_content
+        out.write(template_content)
+        return
     
     insertion_point = match.end() - 1
-    all_meshes = ''.join(mesh_insertions)
     
-    return (template_content[:insertion_point] + 
-            all_meshes + 
-            template_content[insertion_point:])
+    out.write(template_content[:insertion_point])
+    out.writelines(mesh_insertions)
+    out.write(template_content[insertion_point:])
 
 def generate_output_filename(coordinates):
     coords_string = '_'.join([f"{x}_{y}_{z}" for x, y, z in coordinates])
@@ -91,27 +164,30 @@ def main():
         os.makedirs(output_dir_dmx, exist_ok=True)
         os.makedirs(output_dir_vmap, exist_ok=True)
         
-        with open(args.template, 'r', encoding='utf-8') as f:
+        with open(args.template, 'rb') as f:
             template_content = f.read()
         
-        with open(args.mesh, 'r', encoding='utf-8') as f:
+        with open(args.mesh, 'rb') as f:
             mesh_template = f.read()
         
         coordinates = read_coordinates_from_file(args.coords)
         
         template_content = replace_uids_in_content(template_content)
         
+        mesh_cache_path = os.path.join(os.path.dirname(args.mesh), '.mesh_tmpl.cache')
+        mesh_template_fmt, n_uids, n_refs = load_mesh_template(mesh_template, mesh_cache_path)
+        
+        uids = bulk_generate_uids(n_uids * len(coordinates))
+        refs = bulk_generate_reference_ids(n_refs * len(coordinates))
+        
         mesh_insertions = []
         base_node_id = 200
         
         for i, (x, y, z) in enumerate(coordinates):
-            mesh_copy = mesh_template
-            mesh_copy = replace_uids_in_content(mesh_copy)
-            mesh_copy = update_origin_in_mesh(mesh_copy, x, y, z)
-            mesh_copy = update_node_id_in_mesh(mesh_copy, base_node_id + i)
-            mesh_insertions.append(f",\n\t\t\t{mesh_copy}")
-        
-        final_content = insert_meshes_after_nav_data(template_content, mesh_insertions)
+            mesh_uids = uids[i * n_uids:(i + 1) * n_uids]
+            mesh_refs = refs[i * n_refs:(i + 1) * n_refs]
+            mesh_copy = expand_mesh_template(mesh_template_fmt, mesh_uids, mesh_refs, x, y, z, base_node_id + i)
+            mesh_insertions.append(b",\n\t\t\t" + mesh_copy)
         
         if args.output:
             output_filename = os.path.join(output_dir_dmx, args.output)
@@ -119,19 +195,26 @@ def main():
             hashed_filename = generate_output_filename(coordinates)
             output_filename = os.path.join(output_dir_dmx, hashed_filename)
         
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        with open(output_filename, 'wb') as f:
+            insert_meshes_after_nav_data(template_content, mesh_insertions, f)
         
         # Convert to binary vmap
         base_name = os.path.splitext(os.path.basename(output_filename))[0]
         vmap_output = os.path.join(output_dir_vmap, f"{base_name}.vmap")
         
-        subprocess.run(['dmxconvert', '-i', output_filename, '-o', vmap_output, '-oe', 'binary'], check=True)
+        # Run dmxconvert in the background so callers can overlap it with other work
+        proc = subprocess.Popen(['dmxconvert', '-i', output_filename, '-o', vmap_output, '-oe', 'binary'])
         
-        print(f"Success: {output_filename} -> {vmap_output}")
+        print(f"Converting: {output_filename} -> {vmap_output}")
+        return proc
         
     except Exception as e:
         print(f"Failed: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    proc = main()
+    if proc is not None:
+        if proc.wait() == 0:
+            print("Success")
+        else:
+            print(f"Failed: dmxconvert exited with code {proc.returncode}")
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the texture upscaler's direct PNG path
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "textures"))
+from enlarge import upscale_png_data, upscale_texture
+
+def random_image(mode, size=(16, 16), seed=0):
+    rng = random.Random(seed)
+    bytes_per_pixel = len(Image.new(mode, (1, 1)).tobytes())
+    return Image.frombytes(mode, size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * bytes_per_pixel)))
+
+def palette_image(colours, seed=0):
+    rng = random.Random(seed)
+    img = Image.frombytes("P", (16, 16), bytes(rng.randrange(colours) for _ in range(256)))
+    img.putpalette([rng.randrange(256) for _ in range(colours * 3)])
+    return img
+
+def png_bytes(img, **params):
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", **params)
+    return buffer.getvalue()
+
+class UpscalePngDataTest(unittest.TestCase):
+    def assert_matches_pillow(self, data, target_size=(512, 512)):
+        source = Image.open(io.BytesIO(data))
+        expected = source.resize(target_size, Image.NEAREST)
+        upscaled = Image.open(io.BytesIO(upscale_png_data(data, target_size)))
+
+        self.assertEqual(upscaled.mode, source.mode)
+        self.assertEqual(upscaled.size, target_size)
+        self.assertEqual(upscaled.tobytes(), expected.tobytes())
+        if source.mode == "P":
+            self.assertEqual(upscaled.getpalette(), source.getpalette())
+            self.assertEqual(upscaled.info.get("transparency"), source.info.get("transparency"))
+
+    def test_4_bit_palette(self):
+        self.assert_matches_pillow(png_bytes(palette_image(16), bits=4))
+
+    def test_8_bit_palette_with_transparency(self):
+        self.assert_matches_pillow(png_bytes(palette_image(200), transparency=3))
+
+    def test_rgb(self):
+        self.assert_matches_pillow(png_bytes(random_image("RGB")))
+
+    def test_rgba(self):
+        self.assert_matches_pillow(png_bytes(random_image("RGBA")))
+
+    def test_16_bit_grey(self):
+        self.assert_matches_pillow(png_bytes(random_image("I;16")))
+
+    def test_non_square_scale(self):
+        self.assert_matches_pillow(png_bytes(palette_image(16), bits=4), (48, 32))
+
+    def test_trailing_bytes_after_iend_are_ignored(self):
+        self.assert_matches_pillow(png_bytes(random_image("RGB")) + b"\x00\x00")
+
+    def test_non_integer_scale_is_left_to_pillow(self):
+        self.assertIsNone(upscale_png_data(png_bytes(random_image("RGB")), (500, 500)))
+
+class UpscaleTextureTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.png_path = Path(temp_dir.name) / "texture.png"
+
+    def test_non_png_file_falls_back_to_pillow(self):
+        source = random_image("RGB")
+        source.save(self.png_path, "BMP")
+
+        self.assertTrue(upscale_texture(self.png_path))
+        with Image.open(self.png_path) as upscaled:
+            self.assertEqual(upscaled.size, (512, 512))
+            self.assertEqual(upscaled.tobytes(), source.resize((512, 512), Image.NEAREST).tobytes())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the Minecraft world reader, run against the bundled test world
+"""
+
+import os
+import random
+import unittest
+
+import anvil
+from anvil.versions import VERSION_20w17a
+from nbt import nbt
+
+from parse_mc import _AIR_BLOCKS, WorkingMinecraftReader
+
+WORLD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "minecraft_saves", "cs2_test")
+
+class ChunkCacheTest(unittest.TestCase):
+    def test_new_chunk_is_admitted_when_cache_is_full_of_reused_chunks(self):
+        reader = WorkingMinecraftReader(WORLD_PATH, chunk_cache_size=4)
+
+        # Fill the cache with chunks that have all been accessed twice
+        warm_chunks = [(0, 0), (0, 1), (1, 0), (1, 1)]
+        for _ in range(2):
+            for chunk_x, chunk_z in warm_chunks:
+                reader._get_chunk(chunk_x, chunk_z)
+
+        # A new chunk must stay cached, so reading it again doesn't decompress it again
+        first = reader._get_chunk(2, 2)
+        self.assertIn((2, 2), reader.chunk_cache)
+        self.assertIs(reader._get_chunk(2, 2), first)
+        self.assertEqual(len(reader.chunk_cache), 4)
+
+    def test_cache_size_below_one_is_rejected(self):
+        with self.assertRaises(ValueError):
+            WorkingMinecraftReader(WORLD_PATH, chunk_cache_size=0)
+
+    def test_cache_shrinks_back_to_its_limit(self):
+        reader = WorkingMinecraftReader(WORLD_PATH, chunk_cache_size=4)
+        for chunk_x in range(6):
+            reader._get_chunk(chunk_x, 0)
+        reader.chunk_cache_size = 2
+        reader._get_chunk(0, 1)
+
+        self.assertEqual(len(reader.chunk_cache), 2)
+        self.assertIn((0, 1), reader.chunk_cache)
+
+class ScanAreaTest(unittest.TestCase):
+    def test_scan_past_world_floor_keeps_in_range_blocks(self):
+        reader = WorkingMinecraftReader(WORLD_PATH)
+
+        # The bundled world's floor is y=-64, so these boxes start below it
+        self.assertEqual(reader.scan_area(0, -100, 0, 3, -50, 3),
+                         reader.scan_area(0, -64, 0, 3, -50, 3))
+        self.assertEqual(reader.scan_area(-3, -70, -3, 3, -60, 3),
+                         reader.scan_area(-3, -64, -3, 3, -60, 3))
+        self.assertTrue(reader.scan_area(0, -100, 0, 3, -50, 3))
+
+    def test_scan_past_world_ceiling_keeps_in_range_blocks(self):
+        reader = WorkingMinecraftReader(WORLD_PATH)
+
+        # The bundled world's ceiling is y=319
+        self.assertEqual(reader.scan_area(0, -64, 0, 3, 400, 3),
+                         reader.scan_area(0, -64, 0, 3, 319, 3))
+        self.assertTrue(reader.scan_area(0, -64, 0, 3, 400, 3))
+
+def pack_states(states, bits, stretches, signed):
+    """Pack palette indices into longs the way Minecraft stores them"""
+    longs = []
+    if stretches:
+        # Before 20w17a indices run on across long boundaries
+        stream = sum(state << (i * bits) for i, state in enumerate(states))
+        longs = [(stream >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(-(-len(states) * bits // 64))]
+    else:
+        per_long = 64 // bits
+        for start in range(0, len(states), per_long):
+            longs.append(sum(state << (i * bits) for i, state in enumerate(states[start:start + per_long])))
+    if signed:
+        longs = [value - (1 << 64) if value >= 1 << 63 else value for value in longs]
+    return longs
+
+def synthetic_chunk(version, sections, signed=True):
+    """
+    Build a chunk in the pre-1.18 "Level"/"Sections" layout
+
+    Args:
+        version: Data version to stamp on the chunk
+        sections: Dict of section y to (palette block names, 4096 palette indices)
+        signed: Store the longs signed, as NBT does, or already unsigned
+    """
+    root = nbt.NBTFile()
+    root.tags.append(nbt.TAG_Int(name="DataVersion", value=version))
+    level = nbt.TAG_Compound(name="Level")
+    level.tags.extend([nbt.TAG_Int(name="xPos", value=0), nbt.TAG_Int(name="zPos", value=0),
+                       nbt.TAG_List(name="TileEntities", type=nbt.TAG_Compound)])
+    section_list = nbt.TAG_List(name="Sections", type=nbt.TAG_Compound)
+    for section_y, (names, states) in sections.items():
+        section = nbt.TAG_Compound()
+        section.tags.append(nbt.TAG_Byte(name="Y", value=section_y))
+        palette = nbt.TAG_List(name="Palette", type=nbt.TAG_Compound)
+        for name in names:
+            entry = nbt.TAG_Compound()
+            entry.tags.append(nbt.TAG_String(name="Name", value=name))
+            palette.tags.append(entry)
+        section.tags.append(palette)
+        block_states = nbt.TAG_Long_Array(name="BlockStates")
+        bits = max(4, (len(names) - 1).bit_length())
+        block_states.value = pack_states(states, bits, version < VERSION_20w17a, signed)
+        section.tags.append(block_states)
+        section_list.tags.append(section)
+    level.tags.append(section_list)
+    root.tags.append(level)
+    return anvil.Chunk(root)
+
+class ScanSectionTest(unittest.TestCase):
+    def assert_matches_get_block(self, chunk, section_y, x_range=range(16), z_range=range(16),
+                                 reference_chunk=None):
+        y_range = range(section_y << 4, (section_y << 4) + 16)
+        positions, block_ids = WorkingMinecraftReader._scan_section(chunk, section_y, x_range, y_range, z_range)
+        found = dict(zip(map(tuple, positions.tolist()), block_ids))
+
+        expected = {}
+        for x in x_range:
+            for y in y_range:
+                for z in z_range:
+                    block = (reference_chunk or chunk).get_block(x, y, z).id
+                    if block not in _AIR_BLOCKS:
+                        expected[(x, y, z)] = block
+        self.assertEqual(found, expected)
+
+    def test_bundled_world_sections_match_get_block(self):
+        reader = WorkingMinecraftReader(WORLD_PATH)
+        for chunk_x, chunk_z in [(0, 0), (-1, 0), (2, -3)]:
+            chunk = reader._get_chunk(chunk_x, chunk_z)
+            for section in chunk.data["sections"]:
+                if "data" in section["block_states"]:
+                    self.assert_matches_get_block(chunk, section["Y"].value)
+        # A partial box inside a section
+        self.assert_matches_get_block(reader._get_chunk(0, 0), 3, range(2, 9), range(5, 16))
+
+    def test_block_states_section_matches_get_block(self):
+        rng = random.Random(0)
+        for palette_size in (2, 16, 17, 40):
+            names = ["minecraft:air"] + [f"minecraft:block_{i}" for i in range(palette_size - 1)]
+            sections = {2: (names, [rng.randrange(palette_size) for _ in range(4096)])}
+            # anvil can't decode signed longs itself, so it reads an unsigned copy for reference
+            self.assert_matches_get_block(synthetic_chunk(2586, sections), 2,
+                                          reference_chunk=synthetic_chunk(2586, sections, signed=False))
+
+    def test_stretched_block_states_fall_back_to_get_block(self):
+        rng = random.Random(1)
+        names = ["minecraft:air"] + [f"minecraft:block_{i}" for i in range(19)]
+        # anvil's stretched decoding can't take signed longs, so store them unsigned
+        chunk = synthetic_chunk(VERSION_20w17a - 1, {1: (names, [rng.randrange(20) for _ in range(4096)])},
+                                signed=False)
+        self.assertIsNone(WorkingMinecraftReader._section_states(chunk, chunk.get_section(1), len(names)))
+        self.assert_matches_get_block(chunk, 1)
+
+    def test_single_entry_palette_without_data(self):
+        reader = WorkingMinecraftReader(WORLD_PATH)
+        chunk = reader._get_chunk(0, 0)
+        section = chunk.get_section(15)
+        block_states = section["block_states"]
+        self.assertNotIn("data", block_states)
+
+        # The whole section is its only palette entry
+        block_states["palette"][0]["Name"].value = "minecraft:stone"
+        try:
+            positions, block_ids = WorkingMinecraftReader._scan_section(
+                chunk, 15, range(16), range(240, 256), range(16))
+        finally:
+            block_states["palette"][0]["Name"].value = "minecraft:air"
+        self.assertEqual(len(positions), 4096)
+        self.assertEqual(set(block_ids), {"stone"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the VMAP generator script
+"""
+
+import os
+import tempfile
+import unittest
+
+from script import compile_mesh_template, load_mesh_template
+
+MESH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "mesh.dmx")
+
+class MeshTemplateCacheTest(unittest.TestCase):
+    def setUp(self):
+        with open(MESH_PATH, 'rb') as f:
+            self.mesh_template = f.read()
+        self.expected = compile_mesh_template(self.mesh_template)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_path = os.path.join(temp_dir.name, ".mesh_tmpl.cache")
+
+    def test_cache_round_trip(self):
+        self.assertEqual(load_mesh_template(self.mesh_template, self.cache_path), self.expected)
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assertEqual(load_mesh_template(self.mesh_template, self.cache_path), self.expected)
+
+    def test_truncated_cache_is_rebuilt(self):
+        load_mesh_template(self.mesh_template, self.cache_path)
+        with open(self.cache_path, 'r+b') as f:
+            f.truncate(5000)
+
+        self.assertEqual(load_mesh_template(self.mesh_template, self.cache_path), self.expected)
+        # The rebuilt cache is complete again
+        self.assertGreater(os.path.getsize(self.cache_path), 5000)
+        self.assertEqual(load_mesh_template(self.mesh_template, self.cache_path), self.expected)
+
+if __name__ == "__main__":
+    unittest.main()
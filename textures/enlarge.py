@@ -5,21 +5,180 @@ Scales 16x16 PNG textures to 512x512 without blur using nearest-neighbor interpo
 """
 
 import os
+import struct
 import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
 from PIL import Image
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+SAMPLES_PER_PIXEL = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # By PNG colour type
+
+def read_png_chunks(data):
+    """
+    Split PNG file data into a list of (chunk type, chunk data) pairs
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+    
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        chunks.append((chunk_type, data[pos + 8:pos + 8 + length]))
+        pos += length + 12  # Length, type, data and CRC
+        if chunk_type == b"IEND":
+            break  # Ignore anything trailing the image
+    return chunks
+
+def png_chunk(chunk_type, body):
+    """
+    Encode a single PNG chunk including its CRC
+    """
+    return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", zlib.crc32(chunk_type + body))
+
+def unfilter_scanlines(raw, height, row_bytes, filter_bytes):
+    """
+    Undo the per-scanline PNG filters, returning one bytearray per row
+    """
+    rows = []
+    previous = bytearray(row_bytes)
+    pos = 0
+    for _ in range(height):
+        filter_type = raw[pos]
+        row = bytearray(raw[pos + 1:pos + 1 + row_bytes])
+        pos += row_bytes + 1
+        
+        for i in range(row_bytes):
+            left = row[i - filter_bytes] if i >= filter_bytes else 0
+            up = previous[i]
+            if filter_type == 0:
+                break
+            elif filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif filter_type == 4:
+                up_left = previous[i - filter_bytes] if i >= filter_bytes else 0
+                estimate = left + up - up_left
+                distance_left, distance_up, distance_up_left = abs(estimate - left), abs(estimate - up), abs(estimate - up_left)
+                if distance_left <= distance_up and distance_left <= distance_up_left:
+                    predictor = left
+                elif distance_up <= distance_up_left:
+                    predictor = up
+                else:
+                    predictor = up_left
+                row[i] = (row[i] + predictor) & 0xFF
+            else:
+                raise ValueError(f"Unknown PNG filter type {filter_type}")
+        
+        rows.append(row)
+        previous = row
+    return rows
+
+def repeat_pixels(row, width, bits_per_pixel, scale):
+    """
+    Repeat every pixel of an unfiltered scanline scale times horizontally
+    """
+    if bits_per_pixel >= 8:
+        pixel_bytes = bits_per_pixel // 8
+        return b"".join(row[i:i + pixel_bytes] * scale for i in range(0, width * pixel_bytes, pixel_bytes))
+    
+    # Sub-byte pixels (e.g. 4-bit palette indices) are unpacked, repeated and repacked
+    pixels_per_byte = 8 // bits_per_pixel
+    mask = (1 << bits_per_pixel) - 1
+    pixels = [(row[i // pixels_per_byte] >> (8 - bits_per_pixel * (i % pixels_per_byte + 1))) & mask
+              for i in range(width)]
+    repeated = [pixel for pixel in pixels for _ in range(scale)]
+    
+    packed = bytearray()
+    for i in range(0, len(repeated), pixels_per_byte):
+        byte = 0
+        for j, pixel in enumerate(repeated[i:i + pixels_per_byte]):
+            byte |= pixel << (8 - bits_per_pixel * (j + 1))
+        packed.append(byte)
+    return bytes(packed)
+
+def upscale_png_data(data, target_size):
+    """
+    Upscale PNG file data by a whole-number factor working on the raw IDAT
+    stream, keeping the original colour type, bit depth and palette
+    
+    Returns the new PNG file data, or None if the image can't take this path
+    (non-integer scale or interlaced)
+    """
+    chunks = read_png_chunks(data)
+    if not chunks or chunks[0][0] != b"IHDR":
+        raise ValueError("PNG does not start with an IHDR chunk")
+    width, height, bit_depth, colour_type, compression, filter_method, interlace = \
+        struct.unpack(">IIBBBBB", chunks[0][1])
+    
+    scale_x, remainder_x = divmod(target_size[0], width)
+    scale_y, remainder_y = divmod(target_size[1], height)
+    if remainder_x or remainder_y or interlace or colour_type not in SAMPLES_PER_PIXEL:
+        return None
+    
+    bits_per_pixel = SAMPLES_PER_PIXEL[colour_type] * bit_depth
+    row_bytes = (width * bits_per_pixel + 7) // 8
+    raw = zlib.decompress(b"".join(body for chunk_type, body in chunks if chunk_type == b"IDAT"))
+    rows = unfilter_scanlines(raw, height, row_bytes, max(1, bits_per_pixel // 8))
+    
+    # Every output scanline is unfiltered (filter type 0) and repeated scale_y times
+    scanlines = (b"\x00" + repeat_pixels(row, width, bits_per_pixel, scale_x) for row in rows)
+    idat = zlib.compress(b"".join(scanline * scale_y for scanline in scanlines), 9)
+    
+    output = [PNG_SIGNATURE]
+    wrote_idat = False
+    for chunk_type, body in chunks:
+        if chunk_type == b"IHDR":
+            body = struct.pack(">IIBBBBB", target_size[0], target_size[1], bit_depth,
+                               colour_type, compression, filter_method, interlace)
+        elif chunk_type == b"IDAT":
+            if wrote_idat:
+                continue
+            body = idat
+            wrote_idat = True
+        output.append(png_chunk(chunk_type, body))
+    return b"".join(output)
+
 def upscale_texture(png_path, target_size=(512, 512)):
     """
     Upscale a texture using nearest-neighbor interpolation (no blur)
     """
     try:
+        # Whole-number scales are done directly on the PNG data, skipping Pillow
+        try:
+            upscaled_data = upscale_png_data(png_path.read_bytes(), target_size)
+        except (ValueError, IndexError, struct.error, zlib.error):
+            upscaled_data = None  # Let Pillow deal with anything the direct path can't parse
+        if upscaled_data is not None:
+            print(f"Upscaling {png_path.name} to {target_size}")
+            png_path.write_bytes(upscaled_data)
+            print(f"Overwritten: {png_path}")
+            return True
+        
         # Open the image
         with Image.open(png_path) as img:
             print(f"Upscaling {png_path.name} from {img.size} to {target_size}")
             
-            # Use NEAREST (nearest-neighbor) resampling for crisp pixel scaling
-            upscaled = img.resize(target_size, Image.NEAREST)
+            scale_x, remainder_x = divmod(target_size[0], img.width)
+            scale_y, remainder_y = divmod(target_size[1], img.height)
+            
+            if remainder_x == 0 and remainder_y == 0 and img.mode in ("L", "P", "RGB", "RGBA"):
+                # Whole-number scale: repeat each pixel instead of resampling
+                pixels = np.asarray(img)
+                pixels = np.repeat(np.repeat(pixels, scale_y, axis=0), scale_x, axis=1)
+                upscaled = Image.fromarray(pixels)
+                if img.mode == "P":
+                    upscaled.putpalette(img.getpalette())
+                upscaled.info = img.info.copy()  # Keep transparency for save
+            else:
+                # Use NEAREST (nearest-neighbor) resampling for crisp pixel scaling
+                upscaled = img.resize(target_size, Image.NEAREST)
             
             # Save over the original file
             upscaled.save(png_path)
@@ -59,13 +218,13 @@ def main():
     print(f"Found {len(png_files)} PNG files")
     print("Upscaling textures...\n")
     
-    # Track statistics
-    processed_count = 0
+    # Process PNG files across all cores, a few files per task to cut IPC overhead
+    chunksize = max(1, len(png_files) // ((os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(upscale_texture, png_files, chunksize=chunksize))
     
-    # Process each PNG file
-    for png_file in png_files:
-        if upscale_texture(png_file):
-            processed_count += 1
+    # Track statistics
+    processed_count = sum(results)
     
     print(f"\nCompleted!")
     print(f"✓ Processed: {processed_count} textures")
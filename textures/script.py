@@ -6,6 +6,7 @@ Loops through a directory of .png textures and creates corresponding material fi
 
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 def create_material_file(texture_name, output_dir):
@@ -101,13 +102,14 @@ def main():
     print(f"Found {len(png_files)} PNG files in '{texture_dir}'")
     print("Generating material files...")
     
-    # Process each PNG file
-    for png_file in png_files:
-        # Get filename without extension
-        texture_name = png_file.stem
-        
-        # Create the material file
-        create_material_file(texture_name, output_dir)
+    # Get filenames without extension
+    texture_names = [png_file.stem for png_file in png_files]
+    
+    # Create the material files across all cores, a few files per task to cut IPC overhead
+    chunksize = max(1, len(texture_names) // ((os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(create_material_file, texture_names,
+                          [output_dir] * len(texture_names), chunksize=chunksize))
     
     print(f"\nCompleted! Generated {len(png_files)} material files.")
 